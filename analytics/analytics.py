@@ -16,15 +16,18 @@ Uso:
     python analytics/analytics.py
 
 Entradas:
-    - ./data/asistencias.csv
+    - ./data/asistencias.csv (o data/asistencias.parquet si data_gen.py lo generó y está al día)
 
 Salidas:
     - ./outputs/*.csv (sobrescribe si existen)
 
 Notas:
     - Las funciones usan Pandas y son idempotentes.
+    - Con ASISTENCIAS_ENGINE=duckdb las 4 salidas se calculan con SQL en DuckDB
+      directamente sobre el CSV (requiere el paquete opcional `duckdb`).
+    - Con ASISTENCIAS_ENGINE=polars se usa el motor lazy de Polars (paquete opcional `polars`).
     - Maneja fechas en columna 'date' (datetime64[ns]).
-    - Las columnas auxiliares P/A/J se calculan como enteros (0/1).
+    - Las columnas auxiliares P/A/J se calculan como enteros (0/1, int8).
 """
 
 from __future__ import annotations
@@ -35,6 +38,8 @@ from typing import Final
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 
 
 # -------------------------- Paths y configuración --------------------------
@@ -42,36 +47,92 @@ BASE_DIR: Final[Path] = Path(__file__).resolve().parents[1]  # .../analytics ->
 INPUT: Final[str] = os.environ.get("ASISTENCIAS_INPUT") or str(BASE_DIR / "data" / "asistencias.csv")
 OUTDIR: Final[str] = os.environ.get("ASISTENCIAS_OUTDIR") or str(BASE_DIR / "outputs")
 THRESH_RIESGO: Final[float] = float(os.environ.get("ASISTENCIAS_RISK", "0.20"))
+STATUSES: Final[list[str]] = ["P", "A", "J"]
+CATEGORY_COLS: Final[tuple[str, ...]] = ("group_id", "subject", "student_id", "student_name", "sex", "month")
+# weekday se guarda como entero (0 = lunes); el nombre solo se materializa en la salida
+DAY_NAMES: Final[np.ndarray] = np.array(["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"])
+ENGINE: Final[str] = os.environ.get("ASISTENCIAS_ENGINE", "pandas").strip().lower()
 
 
 # -------------------------- Utilidades --------------------------
-def pct_asistencia_from_pa(p: pd.Series, a: pd.Series) -> pd.Series:
-    """Devuelve % asistencia (0-100) como Series. Sin divisiones por cero."""
-    denom = p.add(a)
-    pct = p.div(denom).fillna(0.0).mul(100.0)
-    return pct.round(2)
+def pct_asistencia_from_pa(p: np.ndarray, a: np.ndarray) -> np.ndarray:
+    """Devuelve % asistencia (0-100) como array. Sin divisiones por cero (0.0 si P+A = 0)."""
+    denom = p + a
+    pct = np.zeros(denom.shape, dtype="float64")
+    np.divide(p, denom, out=pct, where=denom > 0)
+    pct *= 100.0
+    return pct.round(2, out=pct)
+
+
+def sum_paj(data: pd.DataFrame, keys: list[str]) -> pd.DataFrame:
+    """Suma P/A/J (int64) por `keys`; equivale a groupby(keys, observed=True, sort=False).sum().
+
+    Cada clave se factoriza por separado y se combinan en un único código entero; las sumas
+    salen de np.bincount sobre ese código.
+    """
+    key_codes, key_uniques = zip(*(pd.factorize(data[k], sort=False) for k in keys))
+
+    # Código combinado en base mixta; filas con alguna clave nula fuera (como dropna=True)
+    combined = np.zeros(len(data), dtype="int64")
+    for codes, uniques in zip(key_codes, key_uniques):
+        combined = combined * len(uniques) + codes
+    valid = np.logical_and.reduce([codes >= 0 for codes in key_codes])
+    flags = [data[c].to_numpy() for c in STATUSES]
+    if not valid.all():
+        combined = combined[valid]
+        flags = [f[valid] for f in flags]
+
+    gcodes, groups = pd.factorize(combined, sort=False)
+    totals = np.stack([np.bincount(gcodes, weights=f, minlength=len(groups)) for f in flags]).astype("int64")
+
+    # Decodificar el código combinado en el valor de cada clave
+    decoded = {}
+    for k, uniques in zip(reversed(keys), reversed(key_uniques)):
+        groups, codes = np.divmod(groups, len(uniques))
+        decoded[k] = uniques.take(codes)
+    out = {k: decoded[k] for k in keys}
+    out.update(zip(STATUSES, totals))
+    return pd.DataFrame(out)
+
+
+def write_csv(df: pd.DataFrame, path: Path) -> None:
+    """Escribe `df` como CSV UTF-8 con el writer en C (multihilo) de PyArrow."""
+    pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), str(path))
 
 
 # -------------------------- Carga y features --------------------------
-def load_data(path: str = INPUT) -> pd.DataFrame:
-    df = pd.read_csv(path, parse_dates=["date"]).copy()
-
-    # Normalizar y filtrar status
-    df["status"] = df["status"].astype(str).str.upper().str.strip()
-    df = df[df["status"].isin(["P", "A", "J"])].copy()
+def parquet_sibling(path: str) -> Path | None:
+    """Parquet que data_gen.py escribe junto al CSV, si existe y no es más antiguo que el CSV."""
+    csv = Path(path)
+    pq = csv.with_suffix(".parquet")
+    if pq.exists() and (not csv.exists() or pq.stat().st_mtime >= csv.stat().st_mtime):
+        return pq
+    return None
 
-    # Máscaras tipadas para contentar al analizador estático
-    mask_p: pd.Series = df["status"].eq("P")
-    mask_a: pd.Series = df["status"].eq("A")
-    mask_j: pd.Series = df["status"].eq("J")
 
-    df["P"] = mask_p.astype("int64")
-    df["A"] = mask_a.astype("int64")
-    df["J"] = mask_j.astype("int64")
-
-    # Derivadas temporales
-    df["month"] = df["date"].dt.to_period("M").astype(str)
-    df["weekday"] = df["date"].dt.day_name()
+def load_data(path: str = INPUT) -> pd.DataFrame:
+    pq = parquet_sibling(path)
+    valid = None
+    if pq is not None:
+        # Ya viene normalizado (status, P/A/J, month, weekday) desde data_gen.py
+        df = pd.read_parquet(pq)
+    else:
+        df = pd.read_csv(path, parse_dates=["date"])
+
+        # Normalizar status a categórico P/A/J (código -1 = inválido; se filtra al final)
+        status = df["status"].astype("string").str.strip().str.upper()
+        codes = pd.Index(STATUSES).get_indexer(status)  # -1 = inválido o nulo
+        cat = pd.Categorical.from_codes(codes, categories=STATUSES)
+        df["status"] = cat
+        valid = codes >= 0
+
+        # Flags 0/1 desde los códigos: una sola pasada, sin máscaras de strings
+        for i, s in enumerate(STATUSES):
+            df[s] = (codes == i).astype("int8")
+
+        # Derivadas temporales
+        df["month"] = df["date"].dt.strftime("%Y-%m").astype("category")
+        df["weekday"] = df["date"].dt.weekday.astype("int8")
 
     # Validación de columnas que usa el pipeline
     needed = {"group_id", "subject", "student_id", "student_name", "sex"}
@@ -82,33 +143,51 @@ def load_data(path: str = INPUT) -> pd.DataFrame:
             f"CSV: {path}\nFaltantes: {missing}\n"
             "Ejecuta data_gen.py y verifica el esquema."
         )
+
+    # Claves de agrupación como categóricas (groupby por códigos enteros) y flags compactos
+    for c in CATEGORY_COLS:
+        df[c] = df[c].astype("category")
+    for c in STATUSES:
+        df[c] = df[c].astype("int8")
+
+    # Un único filtrado de status inválidos, ya con todas las columnas derivadas (sin copias)
+    if valid is not None and not valid.all():
+        df = df.loc[valid]
     return df
 
 
 # -------------------------- Analíticas --------------------------
 def hu11_monthly_summary(data: pd.DataFrame) -> pd.DataFrame:
     keys = ["month", "group_id", "subject"]
-    agg = data.groupby(keys)[["P", "A", "J"]].sum().reset_index()
-    agg["total_sesiones"] = agg[["P", "A", "J"]].sum(axis=1)
-    agg["total_effective"] = agg["P"].add(agg["A"])  # P+A
-    agg["pct_asistencia"] = pct_asistencia_from_pa(agg["P"], agg["A"])
+    agg = sum_paj(data, keys)
+    p, a, j = (agg[c].to_numpy() for c in STATUSES)
+    agg["total_sesiones"] = p + a + j
+    agg["total_effective"] = p + a
+    agg["pct_asistencia"] = pct_asistencia_from_pa(p, a)
     return agg.sort_values(keys).reset_index(drop=True)
 
 
 def hu12_student_percentages(data: pd.DataFrame) -> pd.DataFrame:
     keys = ["student_id", "student_name", "sex", "group_id", "subject"]
-    s = data.groupby(keys)[["P", "A", "J"]].sum().reset_index()
-    s["total_effective"] = s["P"].add(s["A"])
-    s["pct_asistencia"] = pct_asistencia_from_pa(s["P"], s["A"])
+    s = sum_paj(data, keys)
+    p, a = s["P"].to_numpy(), s["A"].to_numpy()
+    s["total_effective"] = p + a
+    s["pct_asistencia"] = pct_asistencia_from_pa(p, a)
     riesgo = s["A"].div(s["total_effective"]).fillna(0.0).ge(THRESH_RIESGO)
     s["riesgo_perdida"] = riesgo.astype(bool)
-    return s.sort_values(["group_id", "subject", "pct_asistencia"], ascending=[True, True, False]).reset_index(drop=True)
+    # student_id desempata igual que el orden por claves del groupby
+    order = ["group_id", "subject", "pct_asistencia", "student_id"]
+    return s.sort_values(order, ascending=[True, True, False, True]).reset_index(drop=True)
 
 
-def hu13_group_summary(data: pd.DataFrame) -> pd.DataFrame:
-    s = hu12_student_percentages(data)
+def hu13_group_summary(s: pd.DataFrame | None = None, data: pd.DataFrame | None = None) -> pd.DataFrame:
+    """Resume por grupo x materia. Reusa `s` (salida de HU12) si se pasa; si no, la calcula desde `data`."""
+    if s is None:
+        if data is None:
+            raise ValueError("hu13_group_summary requiere `s` (HU12) o `data`.")
+        s = hu12_student_percentages(data)
     keys = ["group_id", "subject"]
-    g = s.groupby(keys).agg(
+    g = s.groupby(keys, observed=True, sort=False).agg(
         mean_pct=("pct_asistencia", "mean"),
         median_pct=("pct_asistencia", "median"),
         std_pct=("pct_asistencia", "std"),
@@ -124,25 +203,203 @@ def hu13_group_summary(data: pd.DataFrame) -> pd.DataFrame:
 
 def day_pattern(data: pd.DataFrame) -> pd.DataFrame:
     keys = ["weekday", "group_id", "subject"]
-    d = data.groupby(keys)[["P", "A", "J"]].sum().reset_index()
-    d["total_effective"] = d["P"].add(d["A"])  # P+A
-    d["pct_asistencia"] = pct_asistencia_from_pa(d["P"], d["A"])
+    d = sum_paj(data, keys)
+    d["weekday"] = DAY_NAMES[d["weekday"].to_numpy()]
+    p, a = d["P"].to_numpy(), d["A"].to_numpy()
+    d["total_effective"] = p + a  # P+A
+    d["pct_asistencia"] = pct_asistencia_from_pa(p, a)
     return d.sort_values(keys).reset_index(drop=True)
 
 
+def compute_outputs(data: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    """Las 4 salidas con Pandas, indexadas por nombre de archivo (sin extensión)."""
+    t12 = hu12_student_percentages(data)
+    return {
+        "monthly_summary": hu11_monthly_summary(data),
+        "student_percentages": t12,
+        "group_summary": hu13_group_summary(t12),
+        "day_pattern": day_pattern(data),
+    }
+
+
+# -------------------------- Backend DuckDB --------------------------
+# Vista base: status normalizado, flags P/A/J y derivadas temporales, igual que load_data().
+_DUCKDB_VIEW: Final[str] = """
+CREATE VIEW att AS
+SELECT student_id, student_name, sex, group_id, subject, date,
+       s AS status,
+       (s = 'P')::INTEGER AS P,
+       (s = 'A')::INTEGER AS A,
+       (s = 'J')::INTEGER AS J,
+       strftime(date, '%Y-%m') AS month,
+       dayname(date) AS weekday
+FROM (
+    SELECT *, upper(trim(CAST(status AS VARCHAR))) AS s
+    FROM read_csv_auto({path}, header = true)
+)
+WHERE s IN ('P', 'A', 'J')
+"""
+
+# Mismo orden de operaciones que pct_asistencia_from_pa: (P/(P+A))*100, 0.0 si P+A = 0.
+# Cada consulta descarta filas con claves nulas, como groupby(dropna=True) en Pandas.
+_DUCKDB_PCT: Final[str] = "coalesce(round_even(sum(P) / nullif(sum(P + A), 0) * 100.0, 2), 0.0)"
+
+_DUCKDB_QUERIES: Final[dict[str, str]] = {
+    "monthly_summary": f"""
+        SELECT month, group_id, subject,
+               sum(P)::BIGINT AS P, sum(A)::BIGINT AS A, sum(J)::BIGINT AS J,
+               sum(P + A + J)::BIGINT AS total_sesiones,
+               sum(P + A)::BIGINT AS total_effective,
+               {_DUCKDB_PCT} AS pct_asistencia
+        FROM att
+        WHERE month IS NOT NULL AND group_id IS NOT NULL AND subject IS NOT NULL
+        GROUP BY ALL
+        ORDER BY month, group_id, subject
+    """,
+    "student_percentages": f"""
+        SELECT student_id, student_name, sex, group_id, subject,
+               sum(P)::BIGINT AS P, sum(A)::BIGINT AS A, sum(J)::BIGINT AS J,
+               sum(P + A)::BIGINT AS total_effective,
+               {_DUCKDB_PCT} AS pct_asistencia,
+               coalesce(sum(A) / nullif(sum(P + A), 0), 0.0) >= $thr AS riesgo_perdida
+        FROM att
+        WHERE student_id IS NOT NULL AND student_name IS NOT NULL AND sex IS NOT NULL
+          AND group_id IS NOT NULL AND subject IS NOT NULL
+        GROUP BY ALL
+        ORDER BY group_id, subject, pct_asistencia DESC, student_id
+    """,
+    "day_pattern": f"""
+        SELECT weekday, group_id, subject,
+               sum(P)::BIGINT AS P, sum(A)::BIGINT AS A, sum(J)::BIGINT AS J,
+               sum(P + A)::BIGINT AS total_effective,
+               {_DUCKDB_PCT} AS pct_asistencia
+        FROM att
+        WHERE weekday IS NOT NULL AND group_id IS NOT NULL AND subject IS NOT NULL
+        GROUP BY ALL
+        ORDER BY weekday, group_id, subject
+    """,
+}
+
+
+def compute_outputs_duckdb(path: str = INPUT) -> dict[str, pd.DataFrame]:
+    """Las 4 salidas calculadas en DuckDB sobre el CSV; solo el resultado pasa a Pandas.
+
+    HU13 se deriva del resultado HU12 (pocas filas) con hu13_group_summary, para que media,
+    mediana y desviación salgan exactamente como en el motor Pandas.
+    """
+    try:
+        import duckdb
+    except ImportError as exc:
+        raise ImportError(
+            "ASISTENCIAS_ENGINE=duckdb requiere el paquete 'duckdb' (pip install duckdb)."
+        ) from exc
+
+    con = duckdb.connect()
+    try:
+        con.execute(_DUCKDB_VIEW.format(path="'" + str(path).replace("'", "''") + "'"))
+        tables = {
+            name: con.execute(query, {"thr": THRESH_RIESGO} if "$thr" in query else None).df()
+            for name, query in _DUCKDB_QUERIES.items()
+        }
+    finally:
+        con.close()
+
+    return {
+        "monthly_summary": tables["monthly_summary"],
+        "student_percentages": tables["student_percentages"],
+        "group_summary": hu13_group_summary(tables["student_percentages"]),
+        "day_pattern": tables["day_pattern"],
+    }
+
+
+# -------------------------- Backend Polars --------------------------
+def compute_outputs_polars(path: str = INPUT) -> dict[str, pd.DataFrame]:
+    """Las 4 salidas con el motor lazy de Polars: un solo plan sobre el CSV, ejecutado con collect_all.
+
+    HU13 se deriva del resultado HU12 con hu13_group_summary, igual que en el backend DuckDB.
+    """
+    try:
+        import polars as pl
+    except ImportError as exc:
+        raise ImportError(
+            "ASISTENCIAS_ENGINE=polars requiere el paquete 'polars' (pip install polars)."
+        ) from exc
+
+    def pct(num: str, den: str) -> pl.Expr:
+        # Mismo orden de operaciones que pct_asistencia_from_pa: (num/den)*100, 0.0 si den = 0
+        ratio = pl.when(pl.col(den) > 0).then(pl.col(num) / pl.col(den)).otherwise(0.0)
+        return (ratio * 100.0).round(2, mode="half_to_even")
+
+    def sums(keys: list[str]) -> pl.LazyFrame:
+        # drop_nulls: mismas filas que groupby(dropna=True) en Pandas
+        return att.drop_nulls(keys).group_by(keys).agg(pl.sum("P"), pl.sum("A"), pl.sum("J")).with_columns(
+            (pl.col("P") + pl.col("A")).alias("total_effective")
+        )
+
+    status = pl.col("status").cast(pl.String).str.strip_chars().str.to_uppercase()
+    att = (
+        pl.scan_csv(path, try_parse_dates=True)
+        .with_columns(status.alias("status"))
+        .filter(pl.col("status").is_in(STATUSES))
+        .with_columns(
+            *[(pl.col("status") == s).cast(pl.Int8).alias(s) for s in STATUSES],
+            pl.col("date").dt.strftime("%Y-%m").alias("month"),
+            pl.col("date").dt.strftime("%A").alias("weekday"),
+        )
+    )
+
+    monthly_keys = ["month", "group_id", "subject"]
+    monthly = (
+        sums(monthly_keys)
+        .with_columns((pl.col("P") + pl.col("A") + pl.col("J")).alias("total_sesiones"))
+        .with_columns(pct("P", "total_effective").alias("pct_asistencia"))
+        .select(*monthly_keys, *STATUSES, "total_sesiones", "total_effective", "pct_asistencia")
+        .sort(monthly_keys)
+    )
+
+    students = (
+        sums(["student_id", "student_name", "sex", "group_id", "subject"])
+        .with_columns(
+            pct("P", "total_effective").alias("pct_asistencia"),
+            pl.when(pl.col("total_effective") > 0)
+            .then(pl.col("A") / pl.col("total_effective"))
+            .otherwise(0.0)
+            .ge(THRESH_RIESGO)
+            .alias("riesgo_perdida"),
+        )
+        .sort(["group_id", "subject", "pct_asistencia", "student_id"], descending=[False, False, True, False])
+    )
+
+    day_keys = ["weekday", "group_id", "subject"]
+    daypat = sums(day_keys).with_columns(pct("P", "total_effective").alias("pct_asistencia")).sort(day_keys)
+
+    monthly_df, students_df, daypat_df = (frame.to_pandas() for frame in pl.collect_all([monthly, students, daypat]))
+    return {
+        "monthly_summary": monthly_df,
+        "student_percentages": students_df,
+        "group_summary": hu13_group_summary(students_df),
+        "day_pattern": daypat_df,
+    }
+
+
 # -------------------------- Main --------------------------
 def main() -> None:
     outdir = Path(OUTDIR)
     outdir.mkdir(parents=True, exist_ok=True)
 
-    data = load_data()
+    if ENGINE == "duckdb":
+        outputs = compute_outputs_duckdb()
+    elif ENGINE == "polars":
+        outputs = compute_outputs_polars()
+    elif ENGINE == "pandas":
+        outputs = compute_outputs(load_data())
+    else:
+        raise ValueError(f"ASISTENCIAS_ENGINE no soportado: {ENGINE!r} (usa 'pandas', 'duckdb' o 'polars').")
 
-    hu11_monthly_summary(data).to_csv(outdir / "monthly_summary.csv", index=False, encoding="utf-8")
-    hu12_student_percentages(data).to_csv(outdir / "student_percentages.csv", index=False, encoding="utf-8")
-    hu13_group_summary(data).to_csv(outdir / "group_summary.csv", index=False, encoding="utf-8")
-    day_pattern(data).to_csv(outdir / "day_pattern.csv", index=False, encoding="utf-8")
+    for name, df in outputs.items():
+        write_csv(df, outdir / f"{name}.csv")
 
-    print(f"OK: outputs generados en {outdir}")
+    print(f"OK: outputs generados en {outdir} (engine={ENGINE})")
 
 
 if __name__ == "__main__":
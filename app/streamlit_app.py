@@ -18,8 +18,10 @@ Pestañas:
 Detalles técnicos:
     - Gráficos Altair facetados con dataset en nivel superior y línea objetivo mediante alt.datum(80).
     - Opción Matplotlib (checkbox) en HU13 para versión ejecutiva (si falta la lib, no rompe).
+    - Agregados HU11/HU12/HU13 cacheados (st.cache_data) por combinación de filtros.
     - La ruta de datos puede sobreescribirse con la variable de entorno:
         ASISTENCIAS_INPUT="/ruta/a/asistencias.csv"
+      Si junto al CSV existe un .parquet al día (data_gen.py), se lee ese en su lugar.
 
 Ejecución:
     python -m streamlit run app/streamlit_app.py
@@ -28,9 +30,12 @@ Ejecución:
 from __future__ import annotations
 
 import os
+from datetime import date
+from fractions import Fraction
 from pathlib import Path
 from typing import Final
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 import altair as alt
@@ -39,83 +44,137 @@ st.set_page_config(page_title="Asistencia360", layout="wide")
 
 BASE_DIR: Final[Path] = Path(__file__).resolve().parents[1]
 DEFAULT_INPUT: Final[str] = str(BASE_DIR / "data" / "asistencias.csv")
+STATUSES: Final[list[str]] = ["P", "A", "J"]
 
 
-def pct(p: pd.Series, a: pd.Series) -> pd.Series:
-    return p.div(p.add(a)).fillna(0.0).mul(100.0).round(2)
+def pct(p: np.ndarray, a: np.ndarray) -> np.ndarray:
+    denom = p + a
+    out = np.zeros(denom.shape, dtype="float64")
+    np.divide(p, denom, out=out, where=denom > 0)
+    out *= 100.0
+    return out.round(2, out=out)
 
 
 @st.cache_data(show_spinner=False)
 def load_data() -> pd.DataFrame:
-    input_path = os.environ.get("ASISTENCIAS_INPUT", DEFAULT_INPUT)
-    df = pd.read_csv(input_path, parse_dates=["date"]).copy()
+    input_path = Path(os.environ.get("ASISTENCIAS_INPUT", DEFAULT_INPUT))
+    pq = input_path.with_suffix(".parquet")
+    if pq.exists() and (not input_path.exists() or pq.stat().st_mtime >= input_path.stat().st_mtime):
+        # Generado por data_gen.py con status, P/A/J, month y weekday ya calculados
+        df = pd.read_parquet(pq)
+        valid = None
+    else:
+        df = pd.read_csv(input_path, parse_dates=["date"])
 
-    df["status"] = df["status"].astype(str).str.upper().str.strip()
-    df["P"] = df["status"].eq("P").astype("int64")
-    df["A"] = df["status"].eq("A").astype("int64")
-    df["J"] = df["status"].eq("J").astype("int64")
+        status = df["status"].astype("string").str.strip().str.upper()
+        codes = pd.Index(STATUSES).get_indexer(status)  # -1 = inválido o nulo
+        cat = pd.Categorical.from_codes(codes, categories=STATUSES)
+        df["status"] = cat
+        for i, s in enumerate(STATUSES):
+            df[s] = (codes == i).astype("int8")
 
-    df["month"] = df["date"].dt.to_period("M").astype(str)
-    df["weekday"] = df["date"].dt.day_name()
-    return df
+        df["month"] = df["date"].dt.strftime("%Y-%m").astype("category")
+        df["weekday"] = df["date"].dt.weekday.astype("int8")  # 0 = lunes
+        valid = codes >= 0
 
+    # Claves de filtro categóricas: filter_df compara códigos enteros
+    for c in ("group_id", "subject"):
+        df[c] = df[c].astype("category")
 
-def apply_filters(data: pd.DataFrame) -> pd.DataFrame:
-    min_date, max_date = data["date"].min(), data["date"].max()
+    # Status inválidos fuera, filtrando una sola vez al final
+    return df if valid is None or valid.all() else df.loc[valid]
 
-    st.sidebar.header("Filtros")
-    date_range = st.sidebar.date_input("Rango de fechas", (min_date, max_date),
-                                       min_value=min_date, max_value=max_date)
 
-    groups = sorted(data["group_id"].unique())
-    subjects = sorted(data["subject"].unique())
-    sel_groups = st.sidebar.multiselect("Grupos", groups, default=groups)
-    sel_subjects = st.sidebar.multiselect("Materias", subjects, default=subjects)
+# (rango de fechas, grupos, materias, student_id o None): hashable para usarlo como clave de caché
+FilterSpec = tuple[tuple[date, ...], tuple[str, ...], tuple[str, ...], str | None]
+
 
+@st.cache_data(show_spinner=False)
+def filter_options() -> tuple[pd.Timestamp, pd.Timestamp, list[str], list[str], pd.DataFrame]:
+    # Valores del sidebar: dependen solo de los datos cargados, se calculan una vez
+    data = load_data()
     students_options = (
         data[["student_id", "student_name"]]
         .drop_duplicates()
         .sort_values("student_name")
         .assign(label=lambda d: d["student_name"] + " (" + d["student_id"] + ")")
     )
+    return (data["date"].min(), data["date"].max(),
+            sorted(data["group_id"].unique()), sorted(data["subject"].unique()), students_options)
+
+
+def apply_filters() -> FilterSpec:
+    min_date, max_date, groups, subjects, students_options = filter_options()
+
+    st.sidebar.header("Filtros")
+    date_range = st.sidebar.date_input("Rango de fechas", (min_date, max_date),
+                                       min_value=min_date, max_value=max_date)
+
+    sel_groups = st.sidebar.multiselect("Grupos", groups, default=groups)
+    sel_subjects = st.sidebar.multiselect("Materias", subjects, default=subjects)
+
     sel_student = st.sidebar.selectbox("Filtrar por estudiante (opcional)",
         options=["[Ver todos]"] + students_options["label"].tolist(), index=0)
 
-    mask = (
-        data["date"].between(pd.to_datetime(date_range[0]), pd.to_datetime(date_range[1]))
-        & data["group_id"].isin(sel_groups)
-        & data["subject"].isin(sel_subjects)
-    )
+    chosen_id = None
     if sel_student != "[Ver todos]":
         chosen_id = students_options.loc[students_options["label"] == sel_student, "student_id"].iloc[0]
-        mask &= data["student_id"].eq(chosen_id)
 
-    return data.loc[mask].copy()
+    return tuple(date_range), tuple(sel_groups), tuple(sel_subjects), chosen_id
+
+
+def _isin(col: pd.Series, values: tuple[str, ...]) -> np.ndarray:
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        # Comparar códigos enteros en vez de strings
+        # Valores que no son categoría dan -1, igual que los nulos: se descartan antes de comparar
+        idx = col.cat.categories.get_indexer(list(values))
+        return np.isin(col.cat.codes.to_numpy(), idx[idx >= 0])
+    return np.isin(col.to_numpy(), np.asarray(values, dtype=object))
+
+
+def filter_df(data: pd.DataFrame, spec: FilterSpec) -> pd.DataFrame:
+    date_range, sel_groups, sel_subjects, chosen_id = spec
+    d = data["date"].to_numpy()
+    mask = d >= np.datetime64(date_range[0])
+    np.logical_and(mask, d <= np.datetime64(date_range[1]), out=mask)
+    np.logical_and(mask, _isin(data["group_id"], sel_groups), out=mask)
+    np.logical_and(mask, _isin(data["subject"], sel_subjects), out=mask)
+    if chosen_id is not None:
+        np.logical_and(mask, data["student_id"].to_numpy() == chosen_id, out=mask)
+
+    return data.loc[mask]
 
 
 def hu11_monthly_summary(df: pd.DataFrame) -> pd.DataFrame:
     gcols = ["month", "group_id", "subject"]
-    out = df.groupby(gcols)[["P", "A", "J"]].sum().reset_index()
-    out["total_sesiones"] = out[["P", "A", "J"]].sum(axis=1)
-    out["total_effective"] = out["P"] + out["A"]
-    out["pct_asistencia"] = pct(out["P"], out["A"])
+    out = df.groupby(gcols, observed=True, sort=False)[["P", "A", "J"]].sum().astype("int64").reset_index()
+    p, a, j = (out[c].to_numpy() for c in STATUSES)
+    out["total_sesiones"] = p + a + j
+    out["total_effective"] = p + a
+    out["pct_asistencia"] = pct(p, a)
     return out.sort_values(gcols).reset_index(drop=True)
 
 
 def hu12_student_percentages(df: pd.DataFrame, thr: float = 0.20) -> pd.DataFrame:
     gcols = ["student_id", "student_name", "sex", "group_id", "subject"]
-    s = df.groupby(gcols)[["P", "A", "J"]].sum().reset_index()
-    s["total_effective"] = s["P"] + s["A"]
-    s["pct_asistencia"] = pct(s["P"], s["A"])
-    s["pct_inasistencia"] = s["A"].div(s["total_effective"]).fillna(0.0).mul(100.0).round(2)
-    s["riesgo_perdida"] = s["pct_inasistencia"].ge(thr * 100).astype(bool)
-    return s.sort_values(["group_id", "subject", "pct_asistencia"], ascending=[True, True, False]).reset_index(drop=True)
-
-
-def hu13_group_summary(df: pd.DataFrame) -> pd.DataFrame:
-    s = hu12_student_percentages(df)
+    s = df.groupby(gcols, observed=True, sort=False)[["P", "A", "J"]].sum().astype("int64").reset_index()
+    p, a = s["P"].to_numpy(), s["A"].to_numpy()
+    pa = p + a
+    s["total_effective"] = pa
+    s["pct_asistencia"] = pct(p, a)
+    s["pct_inasistencia"] = pct(a, p)  # A/(P+A)
+    # A/(P+A) >= num/den  <=>  A*den >= num*(P+A): comparación entera exacta, sin redondear thr
+    frac = Fraction(thr).limit_denominator()
+    s["riesgo_perdida"] = (a * frac.denominator >= frac.numerator * pa) & (pa > 0)
+    order = ["group_id", "subject", "pct_asistencia", "student_id"]  # student_id desempata
+    return s.sort_values(order, ascending=[True, True, False, True]).reset_index(drop=True)
+
+
+def hu13_group_summary(s: pd.DataFrame | None = None, df: pd.DataFrame | None = None) -> pd.DataFrame:
+    if s is None:
+        s = hu12_student_percentages(df)
     gcols = ["group_id", "subject"]
-    g = s.groupby(gcols).agg(
+    g = s.groupby(gcols, observed=True, sort=False).agg(
         mean_pct=("pct_asistencia", "mean"),
         median_pct=("pct_asistencia", "median"),
         std_pct=("pct_asistencia", "std"),
@@ -129,8 +188,24 @@ def hu13_group_summary(df: pd.DataFrame) -> pd.DataFrame:
     return g.sort_values(gcols).reset_index(drop=True)
 
 
+# Agregados cacheados por filtro: cambiar de pestaña o repetir un filtro no recalcula los groupby
+@st.cache_data(show_spinner=False, max_entries=32)
+def compute_hu11(spec: FilterSpec) -> pd.DataFrame:
+    return hu11_monthly_summary(filter_df(load_data(), spec))
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def compute_hu12(spec: FilterSpec) -> pd.DataFrame:
+    return hu12_student_percentages(filter_df(load_data(), spec))
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def compute_hu13(spec: FilterSpec) -> pd.DataFrame:
+    return hu13_group_summary(compute_hu12(spec))
+
+
 def render() -> None:
-    data = apply_filters(load_data())
+    spec = apply_filters()
 
     st.title("Asistencia360 — Analítica")
     tab11, tab12, tab13 = st.tabs(["HU11 — Resumen mensual", "HU12 — % por estudiante", "HU13 — Resumen por grupo"])
@@ -138,7 +213,7 @@ def render() -> None:
     # -------------------- HU11 --------------------
     with tab11:
         st.subheader("Resumen mensual por grupo y materia")
-        t11 = hu11_monthly_summary(data)
+        t11 = compute_hu11(spec)
         st.dataframe(t11, use_container_width=True)
 
         # Gráfico original (conservado)
@@ -164,7 +239,7 @@ def render() -> None:
     # -------------------- HU12 --------------------
     with tab12:
         st.subheader("% de asistencia por estudiante")
-        t12 = hu12_student_percentages(data)
+        t12 = compute_hu12(spec)
         st.dataframe(t12, use_container_width=True)
 
         left, right = st.columns(2)
@@ -194,7 +269,7 @@ def render() -> None:
     # -------------------- HU13 --------------------
     with tab13:
         st.subheader("Resumen por grupo")
-        t13 = hu13_group_summary(data)
+        t13 = compute_hu13(spec)
         st.dataframe(t13, use_container_width=True)
 
         # Gráfico original (conservado)
@@ -6,6 +6,7 @@ Asistencia360 — Generador de datos (data_gen.py)
 Descripción:
     Genera datasets sintéticos/anonimizados de asistencia académica para pruebas:
       - data/asistencias.csv
+      - data/asistencias.parquet (mismas filas, ya normalizadas para la analítica)
       - data/students.csv
 
 Qué hace:
@@ -16,7 +17,7 @@ Uso:
     python data_gen.py
 
 Salida:
-    Archivos CSV en ./data
+    Archivos CSV (y el Parquet de asistencias) en ./data
 
 Notas:
     - Los datos son ficticios, pensados para demo/estudio.
@@ -30,7 +31,7 @@ from pandas.tseries.offsets import CustomBusinessDay
 
 
 RANDOM_SEED = 42
-np.random.seed(RANDOM_SEED)
+RNG = np.random.default_rng(RANDOM_SEED)
 
 START_DATE = pd.Timestamp("2025-07-01")
 END_DATE   = pd.Timestamp("2025-10-31")
@@ -52,6 +53,9 @@ DELTA_DAY  = {0: -0.02, 2: 0.00, 4: 0.01}  # L, X, V
 CLAMP_MIN, CLAMP_MAX = 0.55, 0.98
 N_STUDENTS_PER_GROUP = 32
 
+WEEKDAY_NAMES = ["Lunes","Martes","Miércoles","Jueves","Viernes","Sábado","Domingo"]
+STATUS_ORDER = np.array(["P","J","A"])  # orden de las probabilidades acumuladas
+
 # ---------- NUEVO: nombres en español ----------
 MALE_FIRST = [
     "Juan","Carlos","Andrés","Felipe","Santiago","Sebastián","Luis","Jorge","Miguel","Diego",
@@ -80,25 +84,21 @@ def _build_name_pools():
 
 def make_students():
     male_pool, female_pool = _build_name_pools()
-    male_idx = female_idx = 0
-
-    records = []
-    sid = 1
-    for g in GROUPS.keys():
-        for _ in range(N_STUDENTS_PER_GROUP):
-            sex = np.random.choice(["M","F"])
-            if sex == "M":
-                full_name = male_pool[male_idx]; male_idx += 1
-            else:
-                full_name = female_pool[female_idx]; female_idx += 1
-            records.append({
-                "student_id": f"S{sid:03d}",
-                "full_name": full_name,
-                "sex": sex,
-                "group_id": g
-            })
-            sid += 1
-    return pd.DataFrame(records)
+    n_total = len(GROUPS) * N_STUDENTS_PER_GROUP
+
+    # Sexo por estudiante en un solo sorteo; los nombres salen en orden de cada pool
+    sex = RNG.choice(np.array(["M","F"]), size=n_total)
+    m_mask = sex == "M"
+    names = np.empty(n_total, dtype=object)
+    names[m_mask] = male_pool[:m_mask.sum()]
+    names[~m_mask] = female_pool[:(~m_mask).sum()]
+
+    return pd.DataFrame({
+        "student_id": [f"S{i:03d}" for i in range(1, n_total + 1)],
+        "full_name": names,
+        "sex": sex,
+        "group_id": np.repeat(list(GROUPS.keys()), N_STUDENTS_PER_GROUP),
+    })
 
 def business_days(start, end):
     # Solo lunes, miércoles y viernes
@@ -109,46 +109,64 @@ def business_days(start, end):
 
 def generate_attendance(students: pd.DataFrame) -> pd.DataFrame:
     dates = business_days(START_DATE, END_DATE)
-    records = []
+    weekdays = dates.weekday.to_numpy()
+    n_dates = len(dates)
 
     # Sesgo fijo por estudiante (estable en el tiempo)
-    bias_per_student = {sid: np.random.uniform(-0.08, 0.08)
-                        for sid in students["student_id"].unique()}
-
-    weekday_names = ["Lunes","Martes","Miércoles","Jueves","Viernes","Sábado","Domingo"]
-
-    for d in dates:
-        w = int(d.weekday())
-        for g in GROUPS.keys():
-            subj = SCHEDULE[g][w]
-            subdf = students[students["group_id"] == g]
-            for _, row in subdf.iterrows():
-                sid = row["student_id"]
-                p = BASE_GROUP[g] + DELTA_SUBJ[subj] + DELTA_DAY[w] + bias_per_student[sid]
-                p = max(CLAMP_MIN, min(CLAMP_MAX, p))
-
-                # Muestreamos estado
-                if np.random.rand() < p:
-                    status = "P"
-                else:
-                    status = "J" if np.random.rand() < 0.10 else "A"
-
-                records.append({
-                    "student_id": sid,
-                    "student_name": row["full_name"],  # usa nombre realista
-                    "sex": row["sex"],
-                    "group_id": row["group_id"],
-                    "subject": subj,
-                    "date": d.date().isoformat(),
-                    "weekday": weekday_names[w],
-                    "status": status
-                })
-
-    df = pd.DataFrame(records).sort_values(
+    all_ids = students["student_id"].unique()
+    bias_per_student = dict(zip(all_ids, RNG.uniform(-0.08, 0.08, size=len(all_ids))))
+
+    # Columnas por fecha (compartidas por todos los grupos)
+    iso_dates = np.asarray(dates.strftime("%Y-%m-%d"))
+    day_names = np.asarray(WEEKDAY_NAMES)[weekdays]
+    p_day = np.array([DELTA_DAY[w] for w in weekdays])
+
+    frames = []
+    for g in GROUPS.keys():
+        subdf = students[students["group_id"] == g]
+        n_students = len(subdf)
+        student_ids = subdf["student_id"].to_numpy()
+        bias = np.array([bias_per_student[s] for s in student_ids])
+        subj_of_day = np.array([SCHEDULE[g][w] for w in weekdays])
+        delta_subj = np.array([DELTA_SUBJ[s] for s in subj_of_day])
+
+        # Producto cartesiano fechas x estudiantes: repeat sobre fechas, tile sobre estudiantes
+        p = BASE_GROUP[g] + np.repeat(delta_subj + p_day, n_students) + np.tile(bias, n_dates)
+        p = np.clip(p, CLAMP_MIN, CLAMP_MAX)
+
+        # Muestreamos estado con un solo sorteo por fila sobre las probabilidades acumuladas:
+        # P con prob. p, J con (1-p)*0.10, A con el resto
+        cum = np.empty((p.size, 2))
+        cum[:, 0] = p
+        cum[:, 1] = p + (1 - p) * 0.10
+        r = RNG.random(p.size)
+        status = STATUS_ORDER[np.sum(r[:, None] >= cum, axis=1)]
+
+        frames.append(pd.DataFrame({
+            "student_id": np.tile(student_ids, n_dates),
+            "student_name": np.tile(subdf["full_name"].to_numpy(), n_dates),  # usa nombre realista
+            "sex": np.tile(subdf["sex"].to_numpy(), n_dates),
+            "group_id": g,
+            "subject": np.repeat(subj_of_day, n_students),
+            "date": np.repeat(iso_dates, n_students),
+            "weekday": np.repeat(day_names, n_students),
+            "status": status,
+        }))
+
+    df = pd.concat(frames, ignore_index=True).sort_values(
         ["date","group_id","subject","student_id"]
     ).reset_index(drop=True)
     return df
 
+def attendance_features(df: pd.DataFrame) -> pd.DataFrame:
+    # Mismas columnas derivadas que load_data() calcula al leer el CSV
+    out = df.assign(date=pd.to_datetime(df["date"]))
+    for s in ("P", "A", "J"):
+        out[s] = (out["status"] == s).astype("int8")
+    out["month"] = out["date"].dt.strftime("%Y-%m").astype("category")
+    out["weekday"] = out["date"].dt.weekday.astype("int8")
+    return out
+
 def main():
     students = make_students()
     df = generate_attendance(students)
@@ -157,7 +175,8 @@ def main():
     os.makedirs("data", exist_ok=True)
     students.to_csv("data/students.csv", index=False, encoding="utf-8")
     df.to_csv("data/asistencias.csv", index=False, encoding="utf-8")
-    print("OK: data/asistencias.csv y data/students.csv generados.")
+    attendance_features(df).to_parquet("data/asistencias.parquet", index=False, compression="zstd")
+    print("OK: data/asistencias.csv, data/asistencias.parquet y data/students.csv generados.")
 
 if __name__ == "__main__":
     main()